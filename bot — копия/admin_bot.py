@@ -1,10 +1,9 @@
 # admin_bot.py
 
+import sys
 import logging
 import asyncio
 import datetime
-import gspread_asyncio
-from oauth2client.service_account import ServiceAccountCredentials
 from aiogram import Bot, Dispatcher, types
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
@@ -16,6 +15,11 @@ from aiogram.filters.command import CommandObject
 from dotenv import load_dotenv
 import os
 
+# Работа с Google Sheets идёт через общий модуль (один клиент, общие кэши),
+# чтобы не дублировать логику combined_bot.py
+import sheets_service
+from sheets_service import get_all_orders, update_order_status
+
 # Загрузка переменных окружения из .env файла
 load_dotenv()
 
@@ -36,25 +40,6 @@ except ValueError:
 if not ADMIN_IDS:
     logging.warning("Список ADMIN_IDS пуст. Бот не будет доступен никому.")
 
-SPREADSHEET_NAME = os.getenv("SPREADSHEET_NAME", "OrdersForCakes")
-ORDERS_SHEET_NAME = os.getenv("ORDERS_SHEET_NAME", "orders")
-CAKES_SHEET_NAME = os.getenv("CAKES_SHEET_NAME", "cakes")
-
-# Определение Scopes
-scope = [
-    "https://spreadsheets.google.com/feeds",
-    "https://www.googleapis.com/auth/spreadsheets",
-    "https://www.googleapis.com/auth/drive.file",
-    "https://www.googleapis.com/auth/drive"
-]
-
-# Асинхронная инициализация клиента Google Sheets
-async def get_gspread_client():
-    agcm = gspread_asyncio.AsyncioGspreadClientManager(
-        lambda: ServiceAccountCredentials.from_json_keyfile_name("credentials.json", scope)
-    )
-    return await agcm.authorize()
-
 # Инициализация бота и диспетчера
 bot = Bot(token=ADMIN_BOT_TOKEN)
 dp = Dispatcher(storage=MemoryStorage())
@@ -66,49 +51,6 @@ class AdminStates(StatesGroup):
     ViewingOrders = State()
     UpdatingOrderStatus = State()
 
-# Глобальная переменная для клиента Google Sheets
-gc = None
-
-# Вспомогательные функции
-async def get_all_orders():
-    """Возвращает все заказы из листа 'orders'."""
-    try:
-        sh = await gc.open(SPREADSHEET_NAME)
-        orders_sheet = await sh.worksheet(ORDERS_SHEET_NAME)
-        all_orders = await orders_sheet.get_all_records()
-        logging.info(f"Fetched {len(all_orders)} orders from Google Sheets.")
-        return all_orders
-    except Exception as e:
-        logging.error(f"Ошибка при получении всех заказов: {e}")
-        return []
-
-async def update_order_status(order_id, new_status):
-    """Обновляет статус заказа по его OrderID."""
-    try:
-        sh = await gc.open(SPREADSHEET_NAME)
-        orders_sheet = await sh.worksheet(ORDERS_SHEET_NAME)
-        all_orders = await orders_sheet.get_all_records()
-        
-        # Получение заголовков столбцов
-        headers = await orders_sheet.row_values(1)
-        if 'status' not in headers:
-            logging.error("Столбец 'status' не найден в листе.")
-            return False
-        status_col = headers.index('status') + 1  # +1, т.к. индексы начинаются с 0, а столбцы — с 1
-        
-        # Поиск строки с нужным OrderID
-        for idx, order in enumerate(all_orders, start=2):  # start=2, т.к. 1 строка — заголовки
-            if str(order.get('OrderID')) == str(order_id):
-                # Обновление статуса в конкретной ячейке
-                await orders_sheet.update_cell(idx, status_col, new_status)
-                logging.info(f"Updated OrderID {order_id} status to '{new_status}'.")
-                return True
-        logging.warning(f"OrderID {order_id} не найден.")
-        return False
-    except Exception as e:
-        logging.error(f"Ошибка при обновлении статуса заказа {order_id}: {e}")
-        return False
-
 # Проверка, является ли пользователь администратором
 def is_admin(user_id):
     return user_id in ADMIN_IDS
@@ -238,12 +180,20 @@ async def process_update_status(message: Message, state: FSMContext):
 
 # ========= MAIN LAUNCH ==========
 async def main():
-    global gc
-    # Инициализация клиента Google Sheets
-    gc = await get_gspread_client()
-    
+    # Инициализация общего слоя Google Sheets
+    gc = await sheets_service.get_gspread_client()
+    await sheets_service.init(gc)
+
     # Запуск поллинга
     await dp.start_polling(bot, skip_updates=True)
 
 if __name__ == "__main__":
+    # uvloop заметно ускоряет event loop; на Windows и без установленного
+    # пакета продолжаем работать на стандартном asyncio
+    if sys.platform != "win32":
+        try:
+            import uvloop
+            uvloop.install()
+        except ImportError:
+            pass
     asyncio.run(main())
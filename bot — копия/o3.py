@@ -1,15 +1,18 @@
 import logging
 import asyncio
 import datetime
+import json
+import time
 from typing import List, Optional, Dict, Any
 import os
 
 import gspread_asyncio
+import requests
 from oauth2client.service_account import ServiceAccountCredentials
 from aiogram import Bot, Dispatcher, types, Router
 from aiogram.types import (
     ReplyKeyboardMarkup, KeyboardButton, Message,
-    InlineKeyboardMarkup, InlineKeyboardButton
+    InlineKeyboardMarkup, InlineKeyboardButton, InputMediaPhoto
 )
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
@@ -26,10 +29,12 @@ logging.basicConfig(level=logging.INFO)
 # Получение токена и админов
 BOT_TOKEN: str = os.getenv("BOT_TOKEN")
 ADMIN_IDS_STR: str = os.getenv("ADMIN_IDS", "")
+# frozenset вместо списка: is_admin выполняется на каждое обновление,
+# принадлежность проверяется за O(1)
 try:
-    ADMIN_IDS: List[int] = [int(id_.strip()) for id_ in ADMIN_IDS_STR.split(",") if id_.strip().isdigit()]
+    ADMIN_IDS: frozenset = frozenset(int(id_.strip()) for id_ in ADMIN_IDS_STR.split(",") if id_.strip().isdigit())
 except ValueError:
-    ADMIN_IDS = []
+    ADMIN_IDS = frozenset()
     logging.error("Ошибка при парсинге ADMIN_IDS.")
 
 if not ADMIN_IDS:
@@ -46,24 +51,69 @@ SCOPE: List[str] = [
     "https://www.googleapis.com/auth/drive"
 ]
 
-# Константы для кнопок
+# Константы для кнопок: клавиатуры неизменяемы, поэтому собираем их
+# один раз при импорте, а не на каждое сообщение
 CANCEL_TEXT = "Отмена"
+CANCEL_TEXT_LOWER = CANCEL_TEXT.casefold()
 CANCEL_BUTTON = KeyboardButton(text=CANCEL_TEXT)
 
-def get_cancel_markup() -> ReplyKeyboardMarkup:
-    """Возвращает клавиатуру с кнопкой 'Отмена'."""
-    return ReplyKeyboardMarkup(keyboard=[[CANCEL_BUTTON]], resize_keyboard=True)
+def _is_cancel(message: Message) -> bool:
+    """Проверяет, является ли сообщение командой отмены."""
+    return bool(message.text) and message.text.strip().casefold() == CANCEL_TEXT_LOWER
+
+CANCEL_MARKUP = ReplyKeyboardMarkup(keyboard=[[CANCEL_BUTTON]], resize_keyboard=True)
+
+CONFIRM_ORDER_MARKUP = InlineKeyboardMarkup(
+    inline_keyboard=[
+        [InlineKeyboardButton(text="Да", callback_data="confirm_order:yes"),
+         InlineKeyboardButton(text="Нет", callback_data="confirm_order:no")]
+    ]
+)
+
+# Учётные данные читаются с диска один раз и переиспользуются всеми
+# вызовами authorize; менеджер клиента тоже один на процесс, чтобы
+# переподключение не создавало новых объектов и не перечитывало ключ
+_creds: Optional[ServiceAccountCredentials] = None
+
+def _get_creds() -> ServiceAccountCredentials:
+    global _creds
+    if _creds is None:
+        _creds = ServiceAccountCredentials.from_json_keyfile_name("credentials.json", SCOPE)
+    return _creds
+
+_agcm = gspread_asyncio.AsyncioGspreadClientManager(_get_creds)
 
 # Асинхронная инициализация клиента Google Sheets
 async def get_gspread_client() -> gspread_asyncio.AsyncioGspreadClient:
-    agcm = gspread_asyncio.AsyncioGspreadClientManager(
-        lambda: ServiceAccountCredentials.from_json_keyfile_name("credentials.json", SCOPE)
-    )
-    return await agcm.authorize()
+    client = await _agcm.authorize()
+    # gspread_asyncio оборачивает блокирующий gspread, который ходит в API
+    # через requests.Session; увеличиваем пул соединений, чтобы TLS-handshake
+    # не оплачивался заново на каждый запрос
+    try:
+        adapter = requests.adapters.HTTPAdapter(pool_connections=20, pool_maxsize=50)
+        client.gc.session.mount("https://", adapter)
+    except AttributeError:
+        logging.warning("Не удалось настроить пул соединений для gspread-сессии.")
+    return client
+
+# Хранилище FSM: при заданном REDIS_URL состояния живут в Redis и
+# переживают рестарт (а бот можно запускать в несколько реплик);
+# иначе остаёмся на MemoryStorage
+REDIS_URL: Optional[str] = os.getenv("REDIS_URL")
+
+def _make_storage():
+    if REDIS_URL:
+        try:
+            from aiogram.fsm.storage.redis import RedisStorage
+            logging.info("Using RedisStorage for FSM state.")
+            return RedisStorage.from_url(REDIS_URL)
+        except Exception as e:
+            logging.exception("Не удалось подключить RedisStorage, используется MemoryStorage: %s", e)
+    return MemoryStorage()
 
 # Инициализация бота, диспетчера и роутера
 bot = Bot(token=BOT_TOKEN)
-dp = Dispatcher(storage=MemoryStorage())
+dp = Dispatcher(storage=_make_storage())
 router = Router()
 dp.include_router(router)
 
@@ -83,6 +133,41 @@ class AdminStates(StatesGroup):
 # Глобальная переменная для клиента Google Sheets
 gc: Optional[gspread_asyncio.AsyncioGspreadClient] = None
 
+# Кэшированные ссылки на таблицу и листы: open/worksheet стоят по
+# метаданным-запросу каждый, поэтому открываем их один раз
+_sh = None
+_orders_ws = None
+_cakes_ws = None
+_sheets_lock = asyncio.Lock()
+
+async def _ensure_sheets() -> None:
+    """Открывает таблицу и листы один раз и запоминает их в глобалах."""
+    global _sh, _orders_ws, _cakes_ws
+    if _orders_ws is not None and _cakes_ws is not None:
+        return
+    async with _sheets_lock:
+        if _orders_ws is not None and _cakes_ws is not None:
+            return
+        _sh = await gc.open(SPREADSHEET_NAME)
+        _orders_ws = await _sh.worksheet(ORDERS_SHEET_NAME)
+        _cakes_ws = await _sh.worksheet(CAKES_SHEET_NAME)
+        logging.info("Opened spreadsheet and cached worksheet handles.")
+
+def _reset_sheets() -> None:
+    """Сбрасывает кэшированные листы: следующий вызов откроет их заново."""
+    global _sh, _orders_ws, _cakes_ws
+    _sh = None
+    _orders_ws = None
+    _cakes_ws = None
+
+async def _ensure_orders_ws():
+    await _ensure_sheets()
+    return _orders_ws
+
+async def _ensure_cakes_ws():
+    await _ensure_sheets()
+    return _cakes_ws
+
 def is_admin(user_id: int) -> bool:
     return user_id in ADMIN_IDS
 
@@ -113,48 +198,240 @@ async def handle_cancel(message: Message, state: FSMContext) -> None:
     else:
         await message.answer("Возврат в пользовательское меню.", reply_markup=user_menu)
 
+# Распределённый кэш заказов: при наличии Redis заказы пользователя
+# лежат в sorted set orders:{user_id} (score — время заказа), и чтение
+# статуса — один round trip к Redis независимо от размера листа.
+# Без Redis работает обычный кэш в памяти процесса.
+_redis = None
+
+def _user_orders_key(user_id) -> str:
+    return f"orders:{user_id}"
+
+async def _init_redis() -> None:
+    global _redis
+    if not REDIS_URL:
+        return
+    try:
+        import redis.asyncio as aioredis
+        _redis = aioredis.from_url(REDIS_URL, decode_responses=True)
+        await _redis.ping()
+        logging.info("Connected to Redis for per-user order caching.")
+    except Exception as e:
+        _redis = None
+        logging.exception("Не удалось подключиться к Redis, кэш заказов остаётся в памяти: %s", e)
+
+async def _redis_get_user_orders(user_id) -> Optional[List[Dict[str, Any]]]:
+    """Читает заказы пользователя из Redis (None — ключа нет или ошибка)."""
+    if _redis is None:
+        return None
+    try:
+        cached = await _redis.zrevrange(_user_orders_key(user_id), 0, -1)
+    except Exception as e:
+        logging.exception("Ошибка чтения заказов из Redis для %s: %s", user_id, e)
+        return None
+    if not cached:
+        return None
+    return [json.loads(item) for item in cached]
+
+def _order_score(order: Dict[str, Any]) -> float:
+    """Score заказа для sorted set: timestamp даты, 0.0 для битых дат.
+
+    Сентинел datetime.min не конвертируется: .timestamp() на нём
+    падает с ValueError (год 0 вне диапазона epoch).
+    """
+    dt = _parse_date(str(order.get('date', '')))
+    if dt == datetime.datetime.min:
+        return 0.0
+    return dt.timestamp()
+
+async def _redis_store_user_orders(user_id, orders: List[Dict[str, Any]]) -> None:
+    """Полностью перезаписывает sorted set заказов пользователя."""
+    if _redis is None or not orders:
+        return
+    try:
+        mapping = {
+            json.dumps(order, ensure_ascii=False): _order_score(order)
+            for order in orders
+        }
+        pipe = _redis.pipeline()
+        pipe.delete(_user_orders_key(user_id))
+        pipe.zadd(_user_orders_key(user_id), mapping)
+        await pipe.execute()
+    except Exception as e:
+        logging.exception("Ошибка записи заказов в Redis для %s: %s", user_id, e)
+
+async def _redis_add_order(user_id, order: Dict[str, Any]) -> None:
+    """Добавляет один заказ в sorted set пользователя (если ключ уже есть)."""
+    if _redis is None:
+        return
+    try:
+        key = _user_orders_key(user_id)
+        if await _redis.exists(key):
+            score = _order_score(order)
+            await _redis.zadd(key, {json.dumps(order, ensure_ascii=False): score})
+    except Exception as e:
+        logging.exception("Ошибка добавления заказа в Redis для %s: %s", user_id, e)
+
+async def _redis_invalidate_user(user_id) -> None:
+    """Сбрасывает Redis-кэш пользователя (после смены статуса его заказа)."""
+    if _redis is None:
+        return
+    try:
+        await _redis.delete(_user_orders_key(user_id))
+    except Exception as e:
+        logging.exception("Ошибка инвалидации Redis-кэша для %s: %s", user_id, e)
+
+# Время жизни кэшей (в секундах): каталог меняется редко, заказы — чаще
+CATALOG_CACHE_TTL: int = 300
+ORDERS_CACHE_TTL: int = 30
+
+# Кэши прочитанных данных: значение и момент последнего обновления.
+_catalog_cache: Dict[str, Any] = {"data": None, "ts": 0.0}
+# Кэш заказов дополнительно хранит индексы по user_id и OrderID,
+# чтобы выборки не сканировали весь список на каждый клик пагинации
+_orders_cache: Dict[str, Any] = {"data": None, "ts": 0.0, "by_user": {}}
+
+# Single-flight: при одновременном промахе кэша лист скачивает только
+# первая корутина, остальные ждут её future вместо собственных запросов
+_inflight: Dict[str, asyncio.Future] = {}
+
+# Ограничитель одновременных обращений к Sheets из фоновых задач,
+# чтобы всплеск нажатий не выел квоту API
+_sheets_sem = asyncio.Semaphore(20)
+
+# Ссылки на фоновые задачи: event loop хранит task слабо, без ссылки
+# задача может быть собрана GC до завершения
+_background_tasks: set = set()
+
+def _spawn(coro) -> asyncio.Task:
+    """Запускает фоновую задачу, удерживая ссылку до её завершения."""
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+def _parse_date(s: str) -> datetime.datetime:
+    """Ключ сортировки заказов по дате; битые значения уходят в конец.
+
+    Формат "YYYY-MM-DD HH:MM:SS" совместим с ISO 8601, поэтому вместо
+    медленного strptime используется C-реализация fromisoformat.
+    """
+    try:
+        return datetime.datetime.fromisoformat(s)
+    except ValueError:
+        return datetime.datetime.min
+
+def _cache_fresh(cache: Dict[str, Any], ttl: int) -> bool:
+    return cache["data"] is not None and time.monotonic() - cache["ts"] < ttl
+
+def invalidate_catalog() -> None:
+    """Сбрасывает кэш каталога тортов."""
+    _catalog_cache["ts"] = 0.0
+
+def invalidate_orders() -> None:
+    """Сбрасывает кэш заказов (вызывается после записи в лист)."""
+    _orders_cache["ts"] = 0.0
+
 # Функции для работы с Google Sheets
 async def get_catalog_of_cakes() -> List[Dict[str, Any]]:
+    if _cache_fresh(_catalog_cache, CATALOG_CACHE_TTL):
+        return _catalog_cache["data"]
+    inflight = _inflight.get("catalog")
+    if inflight is not None:
+        return await inflight
+    fut: asyncio.Future = asyncio.get_running_loop().create_future()
+    _inflight["catalog"] = fut
     try:
-        sh = await gc.open(SPREADSHEET_NAME)
-        cakes_sheet = await sh.worksheet(CAKES_SHEET_NAME)
-        data = await cakes_sheet.get_all_records()
-        logging.info(f"Fetched {len(data)} cakes from catalog.")
+        try:
+            cakes_sheet = await _ensure_cakes_ws()
+            data = await cakes_sheet.get_all_records()
+            logging.info("Fetched %d cakes from catalog.", len(data))
+            _catalog_cache["data"] = data
+            _catalog_cache["ts"] = time.monotonic()
+        except Exception as e:
+            _reset_sheets()
+            logging.exception("Ошибка при получении каталога тортов: %s", e)
+            data = []
+        fut.set_result(data)
         return data
-    except Exception as e:
-        logging.exception(f"Ошибка при получении каталога тортов: {e}")
-        return []
+    finally:
+        # При отмене задачи-загрузчика CancelledError минует set_result;
+        # будим ожидающих, иначе они зависнут на незавершённом future
+        if not fut.done():
+            fut.cancel()
+        _inflight.pop("catalog", None)
 
 async def get_all_orders() -> List[Dict[str, Any]]:
+    if _cache_fresh(_orders_cache, ORDERS_CACHE_TTL):
+        return _orders_cache["data"]
+    inflight = _inflight.get("orders")
+    if inflight is not None:
+        return await inflight
+    fut: asyncio.Future = asyncio.get_running_loop().create_future()
+    _inflight["orders"] = fut
     try:
-        sh = await gc.open(SPREADSHEET_NAME)
-        orders_sheet = await sh.worksheet(ORDERS_SHEET_NAME)
-        all_orders = await orders_sheet.get_all_records()
-        logging.info(f"Fetched {len(all_orders)} orders.")
+        try:
+            orders_sheet = await _ensure_orders_ws()
+            all_orders = await orders_sheet.get_all_records()
+            logging.info("Fetched %d orders.", len(all_orders))
+            # Сортируем от новых к старым один раз при обновлении кэша:
+            # обработчики пагинации просто нарезают готовый список
+            all_orders.sort(key=lambda x: _parse_date(x.get('date', '')), reverse=True)
+            # Индекс по пользователю строим один раз при обновлении кэша
+            by_user: Dict[str, List[Dict[str, Any]]] = {}
+            for order in all_orders:
+                by_user.setdefault(str(order.get('user_id', '')).strip(), []).append(order)
+            _orders_cache["data"] = all_orders
+            _orders_cache["by_user"] = by_user
+            _orders_cache["ts"] = time.monotonic()
+        except Exception as e:
+            _reset_sheets()
+            logging.exception("Ошибка при получении всех заказов: %s", e)
+            all_orders = []
+        fut.set_result(all_orders)
         return all_orders
-    except Exception as e:
-        logging.exception(f"Ошибка при получении всех заказов: {e}")
-        return []
+    finally:
+        # См. get_catalog_of_cakes: не оставляем ожидающих на
+        # незавершённом future при отмене загрузчика
+        if not fut.done():
+            fut.cancel()
+        _inflight.pop("orders", None)
 
 async def get_all_orders_by_user(user_id: int) -> List[Dict[str, Any]]:
-    try:
-        sh = await gc.open(SPREADSHEET_NAME)
-        orders_sheet = await sh.worksheet(ORDERS_SHEET_NAME)
-        all_orders = await orders_sheet.get_all_records()
-        user_orders = [o for o in all_orders if str(o.get('user_id', '')).strip() == str(user_id)]
-        logging.info(f"User {user_id} has {len(user_orders)} orders.")
-        return user_orders
-    except Exception as e:
-        logging.exception(f"Ошибка при получении заказов пользователя {user_id}: {e}")
-        return []
+    # Сначала пробуем Redis: один round trip вместо чтения листа
+    cached = await _redis_get_user_orders(user_id)
+    if cached is not None:
+        logging.info("User %s has %d orders (redis).", user_id, len(cached))
+        return cached
+    await get_all_orders()  # освежает кэш и индексы при необходимости
+    user_orders = _orders_cache["by_user"].get(str(user_id), [])
+    # Холодный старт: заполняем Redis, чтобы следующие чтения шли мимо Sheets
+    await _redis_store_user_orders(user_id, user_orders)
+    logging.info("User %s has %d orders.", user_id, len(user_orders))
+    return user_orders
+
+# Счётчик следующего OrderID: инициализируется один раз по столбцу ID,
+# дальше выдаёт номера из памяти под блокировкой — без скачивания листа
+# и без гонки между одновременными заказами
+_next_order_id: Optional[int] = None
+_order_id_lock = asyncio.Lock()
+
+async def _reserve_order_id(orders_sheet) -> int:
+    global _next_order_id
+    async with _order_id_lock:
+        if _next_order_id is None:
+            ids = await orders_sheet.col_values(1)
+            numeric = [int(v) for v in ids[1:] if v.isdigit()]
+            _next_order_id = max(numeric) + 1 if numeric else 1
+        order_id = _next_order_id
+        _next_order_id += 1
+        return order_id
 
 async def create_new_order(user_id: int, user_name: str, cake: Dict[str, Any],
                            taste: str, size: str, decor: str) -> Optional[int]:
     try:
-        sh = await gc.open(SPREADSHEET_NAME)
-        orders_sheet = await sh.worksheet(ORDERS_SHEET_NAME)
-        all_values = await orders_sheet.get_all_values()
-        order_id = 1 if len(all_values) < 2 else int(all_values[-1][0]) + 1
+        orders_sheet = await _ensure_orders_ws()
+        order_id = await _reserve_order_id(orders_sheet)
         status = "ожидается подтверждение администратора"
         current_date = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         await orders_sheet.append_row([
@@ -169,32 +446,74 @@ async def create_new_order(user_id: int, user_name: str, cake: Dict[str, Any],
             status,
             current_date
         ])
-        logging.info(f"Created new order {order_id} for user {user_id}.")
+        invalidate_orders()
+        await _redis_add_order(user_id, {
+            'OrderID': order_id,
+            'user_id': str(user_id),
+            'user_name': user_name.strip(),
+            'cake_name': cake.get('name', '').strip(),
+            'price': str(cake.get('price', '')).strip(),
+            'taste': taste.strip(),
+            'size': size.strip(),
+            'decor': decor.strip(),
+            'status': status,
+            'date': current_date,
+        })
+        logging.info("Created new order %s for user %s.", order_id, user_id)
         return order_id
     except Exception as e:
-        logging.exception(f"Ошибка при создании заказа: {e}")
+        _reset_sheets()
+        logging.exception("Ошибка при создании заказа: %s", e)
         return None
 
-async def update_order_status(order_id: str, new_status: str) -> bool:
-    try:
-        sh = await gc.open(SPREADSHEET_NAME)
-        orders_sheet = await sh.worksheet(ORDERS_SHEET_NAME)
-        all_orders = await orders_sheet.get_all_records()
+# Заголовки листа заказов и номер столбца 'status': заголовки между
+# деплоями не меняются, поэтому читаем их один раз при первом обновлении
+_orders_headers: List[str] = []
+_status_col: Optional[int] = None
+
+async def _get_status_col(orders_sheet) -> Optional[int]:
+    global _status_col
+    if _status_col is None:
         headers = await orders_sheet.row_values(1)
         if 'status' not in headers:
             logging.error("Столбец 'status' не найден.")
-            return False
-        status_col = headers.index('status') + 1
-        for idx, order in enumerate(all_orders, start=2):
-            if str(order.get('OrderID')) == str(order_id):
-                await orders_sheet.update_cell(idx, status_col, new_status)
-                logging.info(f"Updated OrderID {order_id} to '{new_status}'.")
-                return True
-        logging.warning(f"OrderID {order_id} не найден.")
-        return False
+            return None
+        _orders_headers.clear()
+        _orders_headers.extend(headers)
+        _status_col = headers.index('status') + 1
+    return _status_col
+
+async def update_order_status(order_id: str, new_status: str) -> Optional[Dict[str, Any]]:
+    """Обновляет статус заказа и возвращает обновлённую строку (или None)."""
+    try:
+        orders_sheet = await _ensure_orders_ws()
+        status_col = await _get_status_col(orders_sheet)
+        if status_col is None:
+            return None
+        # Скачиваем только столбец OrderID вместо всего листа
+        ids = await orders_sheet.col_values(1)
+        try:
+            row_idx = ids.index(str(order_id)) + 1
+        except ValueError:
+            logging.warning("OrderID %s не найден.", order_id)
+            return None
+        await orders_sheet.update_cell(row_idx, status_col, new_status)
+        invalidate_orders()
+        logging.info("Updated OrderID %s to '%s'.", order_id, new_status)
+        # Возвращаем обновлённую строку, чтобы вызывающий код не скачивал
+        # весь лист заново ради user_id для уведомления
+        row_values = await orders_sheet.row_values(row_idx)
+        padded = row_values + [''] * (len(_orders_headers) - len(row_values))
+        order = dict(zip(_orders_headers, padded))
+        order['status'] = new_status
+        # Redis-кэш этого пользователя устарел — сбрасываем, следующее
+        # чтение перезаполнит его актуальными данными
+        await _redis_invalidate_user(order.get('user_id', ''))
+        return order
     except Exception as e:
-        logging.exception(f"Ошибка при обновлении статуса заказа {order_id}: {e}")
-        return False
+        _reset_sheets()
+        logging.exception("Ошибка при обновлении статуса заказа %s: %s", order_id, e)
+        return None
 
 async def send_status_update(user_id: int, order_id: str, new_status: str) -> None:
     try:
@@ -203,21 +522,26 @@ async def send_status_update(user_id: int, order_id: str, new_status: str) -> No
             text=f"✅ Ваш заказ №{order_id} обновлён.\nНовый статус: <b>{new_status}</b>",
             parse_mode='HTML'
         )
-        logging.info(f"Sent status update to user {user_id} for order {order_id}.")
+        logging.info("Sent status update to user %s for order %s.", user_id, order_id)
     except Exception as e:
-        logging.exception(f"Не удалось отправить уведомление пользователю {user_id}: {e}")
+        logging.exception("Не удалось отправить уведомление пользователю %s: %s", user_id, e)
 
 # Функция формирования текста и инлайн-клавиатуры для пагинации заказов
-def get_orders_page_text_and_markup(orders: List[Dict[str, Any]], page: int, page_size: int = 5):
+def get_orders_page_text_and_markup(orders: List[Dict[str, Any]], page: int, page_size: int = 5,
+                                    title: str = "<b>Ваши заказы:</b>",
+                                    include_user: bool = False,
+                                    callback_prefix: str = "orders_page"):
     total = len(orders)
     pages = (total + page_size - 1) // page_size
     start = page * page_size
     end = start + page_size
     chunk = orders[start:end]
-    text = "<b>Ваши заказы:</b>\n\n"
+    text = f"{title}\n\n"
     for o in chunk:
+        text += f"№ {o.get('OrderID')}\n"
+        if include_user:
+            text += f"Пользователь: @{o.get('user_name')} (ID: {o.get('user_id')})\n"
         text += (
-            f"№ {o.get('OrderID')}\n"
             f"Торт: {o.get('cake_name')}\n"
             f"Цена: {o.get('price')} руб.\n"
             f"Вкус: {o.get('taste')}\n"
@@ -229,12 +553,12 @@ def get_orders_page_text_and_markup(orders: List[Dict[str, Any]], page: int, pag
         )
     buttons = []
     if page > 0:
-        buttons.append(InlineKeyboardButton("Назад", callback_data=f"orders_page:{page-1}"))
+        buttons.append(InlineKeyboardButton(text="Назад", callback_data=f"{callback_prefix}:{page-1}"))
     if page < pages - 1:
-        buttons.append(InlineKeyboardButton("Вперёд", callback_data=f"orders_page:{page+1}"))
-    markup = InlineKeyboardMarkup(row_width=2)
-    if buttons:
-        markup.add(*buttons)
+        buttons.append(InlineKeyboardButton(text="Вперёд", callback_data=f"{callback_prefix}:{page+1}"))
+    # В aiogram 3 InlineKeyboardMarkup — Pydantic-модель: строки клавиатуры
+    # передаются сразу в inline_keyboard, методов add/row_width больше нет
+    markup = InlineKeyboardMarkup(inline_keyboard=[buttons] if buttons else [])
     return text, markup
 
 # Обработчики бота
@@ -267,19 +591,45 @@ async def user_make_order(message: Message, state: FSMContext):
         await message.answer("Каталог тортов пока пуст.")
         return
 
-    for cake in catalog:
-        text = (
+    def cake_text(cake: Dict[str, Any]) -> str:
+        return (
             f"<b>{cake.get('name', '')}</b>\n"
             f"Цена: {cake.get('price', '')} руб.\n"
             f"{cake.get('description', '')}"
         )
-        photo = cake.get('photo')
-        if photo:
-            await message.answer_photo(photo=photo, caption=text, parse_mode='HTML')
-        else:
-            await message.answer(text, parse_mode='HTML')
 
-    await message.answer("Введите название торта:", reply_markup=get_cancel_markup())
+    photo_cakes = [c for c in catalog if c.get('photo')]
+    text_cakes = [c for c in catalog if not c.get('photo')]
+
+    # Торты с фото уходят медиа-группами по 10 за один вызов API
+    # вместо отдельного answer_photo на каждый торт
+    for i in range(0, len(photo_cakes), 10):
+        chunk = photo_cakes[i:i + 10]
+        if len(chunk) == 1:
+            # Медиа-группа требует минимум два элемента
+            cake = chunk[0]
+            await message.answer_photo(photo=cake['photo'], caption=cake_text(cake), parse_mode='HTML')
+            continue
+        media = [
+            InputMediaPhoto(media=c['photo'], caption=cake_text(c), parse_mode='HTML')
+            for c in chunk
+        ]
+        await bot.send_media_group(chat_id=message.chat.id, media=media)
+
+    # Текстовые описания отправляем параллельно под семафором
+    if text_cakes:
+        sem = asyncio.Semaphore(20)
+
+        async def send_text(cake: Dict[str, Any]) -> None:
+            async with sem:
+                await message.answer(cake_text(cake), parse_mode='HTML')
+
+        results = await asyncio.gather(*(send_text(c) for c in text_cakes), return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                logging.exception("Не удалось отправить описание торта: %s", result)
+
+    await message.answer("Введите название торта:", reply_markup=CANCEL_MARKUP)
     await state.set_state(OrderStates.ChoosingCake)
 
 @router.message(lambda m: m.text == "Статус заказов")
@@ -292,25 +642,35 @@ async def user_check_status(message: Message, state: FSMContext):
         await message.answer("Администратор не может использовать этот функционал.")
         return
 
-    orders = await get_all_orders_by_user(user_id)
-    if not orders:
-        await message.answer("У вас ещё нет заказов.", reply_markup=user_menu)
-        return
+    # Ответ пользователю уходит сразу, медленный поход в Sheets
+    # выполняется фоновой задачей и не задерживает другие обновления
+    await message.answer("Загружаю ваши заказы…")
+    _spawn(_send_user_orders(message, user_id))
 
+async def _send_user_orders(message: Message, user_id: int) -> None:
+    """Фоновая отправка первой страницы заказов пользователя.
+
+    Задача живёт вне пайплайна обработки aiogram, поэтому ошибки ловим
+    сами — иначе пользователь навсегда останется на «Загружаю…».
+    """
     try:
-        sorted_orders = sorted(
-            orders,
-            key=lambda x: datetime.datetime.strptime(x.get('date', ''), "%Y-%m-%d %H:%M:%S"),
-            reverse=True
-        )
+        async with _sheets_sem:
+            # Список из кэша уже отсортирован от новых к старым
+            sorted_orders = await get_all_orders_by_user(user_id)
+        if not sorted_orders:
+            await message.answer("У вас ещё нет заказов.", reply_markup=user_menu)
+            return
+
+        page = 0
+        page_size = 1 #5
+        text, markup = get_orders_page_text_and_markup(sorted_orders, page, page_size)
+        await message.answer(text, reply_markup=markup, parse_mode="HTML")
     except Exception as e:
-        logging.exception(f"Ошибка при сортировке заказов: {e}")
-        sorted_orders = orders
-
-    page = 0
-    page_size = 1 #5
-    text, markup = get_orders_page_text_and_markup(sorted_orders, page, page_size)
-    await message.answer(text, reply_markup=markup, parse_mode="HTML")
+        logging.exception("Ошибка при выводе заказов пользователя %s: %s", user_id, e)
+        try:
+            await message.answer("Не удалось загрузить заказы. Попробуйте позже.", reply_markup=user_menu)
+        except Exception:
+            pass
 
 @router.callback_query(lambda c: c.data and c.data.startswith("orders_page:"))
 async def orders_pagination_callback(callback_query: types.CallbackQuery, state: FSMContext):
@@ -321,31 +681,37 @@ async def orders_pagination_callback(callback_query: types.CallbackQuery, state:
         await callback_query.answer("Неверный номер страницы.")
         return
 
-    orders = await get_all_orders_by_user(callback_query.from_user.id)
-    if not orders:
-        await callback_query.message.edit_text("У вас ещё нет заказов.", reply_markup=user_menu)
-        await callback_query.answer()
-        return
+    # Снимаем "часики" сразу; редактирование страницы — в фоне
+    await callback_query.answer()
+    _spawn(_show_orders_page(callback_query, page))
+
+async def _show_orders_page(callback_query: types.CallbackQuery, page: int) -> None:
+    """Фоновое редактирование сообщения со страницей заказов.
 
+    Ошибки ловим сами: задача не проходит через пайплайн aiogram.
+    """
     try:
-        sorted_orders = sorted(
-            orders,
-            key=lambda x: datetime.datetime.strptime(x.get('date', ''), "%Y-%m-%d %H:%M:%S"),
-            reverse=True
-        )
+        async with _sheets_sem:
+            # Список из кэша уже отсортирован от новых к старым
+            sorted_orders = await get_all_orders_by_user(callback_query.from_user.id)
+        if not sorted_orders:
+            await callback_query.message.edit_text("У вас ещё нет заказов.", reply_markup=user_menu)
+            return
+
+        page_size = 1 #5
+        text, markup = get_orders_page_text_and_markup(sorted_orders, page, page_size)
+        await callback_query.message.edit_text(text, reply_markup=markup, parse_mode="HTML")
     except Exception as e:
-        logging.exception(f"Ошибка при сортировке заказов: {e}")
-        sorted_orders = orders
-
-    page_size = 1 #5
-    text, markup = get_orders_page_text_and_markup(sorted_orders, page, page_size)
-    await callback_query.message.edit_text(text, reply_markup=markup, parse_mode="HTML")
-    await callback_query.answer()
+        logging.exception("Ошибка при показе страницы заказов: %s", e)
+        try:
+            await callback_query.message.answer("Не удалось загрузить страницу заказов. Попробуйте позже.")
+        except Exception:
+            pass
 
 @router.message(OrderStates.ChoosingCake)
 async def user_choosing_cake(message: Message, state: FSMContext):
     """Выбор торта пользователем."""
-    if message.text.strip().lower() == CANCEL_TEXT.lower():
+    if _is_cancel(message):
         await handle_cancel(message, state)
         return
 
@@ -362,24 +728,24 @@ async def user_choosing_cake(message: Message, state: FSMContext):
         return
 
     await state.update_data(chosen_cake=chosen_cake)
-    await message.answer("Какой вкус вы предпочитаете?", reply_markup=get_cancel_markup())
+    await message.answer("Какой вкус вы предпочитаете?", reply_markup=CANCEL_MARKUP)
     await state.set_state(OrderStates.ChoosingTaste)
 
 @router.message(OrderStates.ChoosingTaste)
 async def user_choosing_taste(message: Message, state: FSMContext):
     """Выбор вкуса."""
-    if message.text.strip().lower() == CANCEL_TEXT.lower():
+    if _is_cancel(message):
         await handle_cancel(message, state)
         return
 
     await state.update_data(taste=message.text.strip())
-    await message.answer("На сколько персон?", reply_markup=get_cancel_markup())
+    await message.answer("На сколько персон?", reply_markup=CANCEL_MARKUP)
     await state.set_state(OrderStates.ChoosingSize)
 
 @router.message(OrderStates.ChoosingSize)
 async def user_choosing_size(message: Message, state: FSMContext):
     """Выбор количества персон."""
-    if message.text.strip().lower() == CANCEL_TEXT.lower():
+    if _is_cancel(message):
         await handle_cancel(message, state)
         return
 
@@ -388,13 +754,13 @@ async def user_choosing_size(message: Message, state: FSMContext):
         await message.answer("Пожалуйста, введите число или нажмите Отмена.")
         return
     await state.update_data(size=size)
-    await message.answer("Какой декор? (например: ягоды, фигурки...)", reply_markup=get_cancel_markup())
+    await message.answer("Какой декор? (например: ягоды, фигурки...)", reply_markup=CANCEL_MARKUP)
     await state.set_state(OrderStates.ChoosingDecor)
 
 @router.message(OrderStates.ChoosingDecor)
 async def user_choosing_decor(message: Message, state: FSMContext):
     """Выбор декора."""
-    if message.text.strip().lower() == CANCEL_TEXT.lower():
+    if _is_cancel(message):
         await handle_cancel(message, state)
         return
 
@@ -417,12 +783,7 @@ async def user_choosing_decor(message: Message, state: FSMContext):
     await message.answer(
         confirmation_text,
         parse_mode='HTML',
-        reply_markup=InlineKeyboardMarkup(
-            inline_keyboard=[
-                [InlineKeyboardButton(text="Да", callback_data="confirm_order:yes"),
-                 InlineKeyboardButton(text="Нет", callback_data="confirm_order:no")]
-            ]
-        )
+        reply_markup=CONFIRM_ORDER_MARKUP
     )
     await state.set_state(OrderStates.Confirming)
 
@@ -455,25 +816,32 @@ async def order_confirmation_callback(callback_query: types.CallbackQuery, state
             parse_mode="HTML"
         )
         current_date = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        for admin_id in ADMIN_IDS:
-            try:
-                await bot.send_message(
-                    chat_id=admin_id,
-                    text=(
-                        f"📦 <b>Новый заказ</b>\n\n"
-                        f"№ {order_id}\n"
-                        f"Пользователь: @{user_name} (ID: {user_id})\n"
-                        f"Торт: {data.get('chosen_cake', {}).get('name', '')}\n"
-                        f"Вкус: {data.get('taste', '')}\n"
-                        f"Размер: {data.get('size', '')} персон\n"
-                        f"Декор: {data.get('decor', '')}\n"
-                        f"Статус: ожидается подтверждение администратора\n"
-                        f"Дата: {current_date}"
-                    ),
-                    parse_mode='HTML'
-                )
-            except Exception as e:
-                logging.exception(f"Не удалось отправить уведомление администратору {admin_id}: {e}")
+        notify_text = (
+            f"📦 <b>Новый заказ</b>\n\n"
+            f"№ {order_id}\n"
+            f"Пользователь: @{user_name} (ID: {user_id})\n"
+            f"Торт: {data.get('chosen_cake', {}).get('name', '')}\n"
+            f"Вкус: {data.get('taste', '')}\n"
+            f"Размер: {data.get('size', '')} персон\n"
+            f"Декор: {data.get('decor', '')}\n"
+            f"Статус: ожидается подтверждение администратора\n"
+            f"Дата: {current_date}"
+        )
+        # Уведомляем администраторов параллельно, а не по одному round trip;
+        # семафор держит рассылку в пределах лимита сообщений Telegram
+        sem = asyncio.Semaphore(25)
+
+        async def notify(admin_id: int) -> None:
+            async with sem:
+                await bot.send_message(chat_id=admin_id, text=notify_text, parse_mode='HTML')
+
+        results = await asyncio.gather(
+            *(notify(admin_id) for admin_id in ADMIN_IDS),
+            return_exceptions=True
+        )
+        for admin_id, result in zip(ADMIN_IDS, results):
+            if isinstance(result, Exception):
+                logging.exception("Не удалось отправить уведомление администратору %s: %s", admin_id, result)
     else:
         await callback_query.message.edit_text("Произошла ошибка при оформлении заказа.", reply_markup=user_menu)
     await state.clear()
@@ -487,49 +855,66 @@ async def admin_view_orders_menu(message: Message, state: FSMContext):
         await message.answer("У вас нет доступа к этому боту.")
         return
 
-    all_orders = await get_all_orders()
-    if not all_orders:
-        await message.answer("Нет доступных заказов.", reply_markup=admin_menu)
-        return
+    # Подтверждаем приём команды сразу, выгрузку делаем в фоне
+    await message.answer("Загружаю заказы…")
+    _spawn(_send_admin_orders(message))
 
-    filtered_orders = [o for o in all_orders if o.get('status') != "Доставлен"]
-    if not filtered_orders:
-        await message.answer("Нет заказов, ожидающих подтверждения.", reply_markup=admin_menu)
-        return
+ADMIN_ORDERS_PAGE_SIZE = 10
+
+async def _get_admin_active_orders() -> List[Dict[str, Any]]:
+    """Возвращает недоставленные заказы (кэш уже отсортирован по дате)."""
+    async with _sheets_sem:
+        all_orders = await get_all_orders()
+    return [o for o in all_orders if o.get('status') != "Доставлен"]
+
+async def _send_admin_orders(message: Message) -> None:
+    """Фоновая отправка первой страницы заказов администратору.
 
+    Ошибки ловим сами: задача не проходит через пайплайн aiogram.
+    """
     try:
-        sorted_orders = sorted(
-            filtered_orders,
-            key=lambda x: datetime.datetime.strptime(x.get('date', ''), "%Y-%m-%d %H:%M:%S"),
-            reverse=True
+        sorted_orders = await _get_admin_active_orders()
+        if not sorted_orders:
+            await message.answer("Нет заказов, ожидающих подтверждения.", reply_markup=admin_menu)
+            return
+
+        # Отправляем одно сообщение с инлайн-пагинацией вместо всех страниц
+        # подряд — длинный список не упирается в лимит сообщений Telegram
+        text, markup = get_orders_page_text_and_markup(
+            sorted_orders, 0, ADMIN_ORDERS_PAGE_SIZE,
+            title="<b>Заказы:</b>", include_user=True, callback_prefix="admin_orders_page"
         )
+        await message.answer(text, parse_mode='HTML', reply_markup=markup)
     except Exception as e:
-        logging.exception(f"Ошибка при сортировке заказов: {e}")
-        sorted_orders = filtered_orders
-
-    page_size = 10
-    total_orders = len(sorted_orders)
-    pages = (total_orders + page_size - 1) // page_size
-
-    for page in range(pages):
-        start = page * page_size
-        end = start + page_size
-        chunk = sorted_orders[start:end]
-        text = "<b>Заказы:</b>\n\n"
-        for o in chunk:
-            text += (
-                f"№ {o.get('OrderID')}\n"
-                f"Пользователь: @{o.get('user_name')} (ID: {o.get('user_id')})\n"
-                f"Торт: {o.get('cake_name')}\n"
-                f"Цена: {o.get('price')} руб.\n"
-                f"Вкус: {o.get('taste')}\n"
-                f"Размер: {o.get('size')} персон\n"
-                f"Декор: {o.get('decor')}\n"
-                f"Статус: {o.get('status')}\n"
-                f"Дата: {o.get('date')}\n"
-                "-----------------------\n"
-            )
-        await message.answer(text, parse_mode='HTML', reply_markup=admin_menu)
+        logging.exception("Ошибка при выводе заказов администратору: %s", e)
+        try:
+            await message.answer("Не удалось загрузить заказы. Попробуйте позже.", reply_markup=admin_menu)
+        except Exception:
+            pass
+
+@router.callback_query(lambda c: c.data and c.data.startswith("admin_orders_page:"))
+async def admin_orders_pagination_callback(callback_query: types.CallbackQuery, state: FSMContext):
+    """Обработчик навигации по страницам заказов администратора."""
+    if not is_admin(callback_query.from_user.id):
+        await callback_query.answer("У вас нет доступа.")
+        return
+    try:
+        page = int(callback_query.data.split(":")[1])
+    except ValueError:
+        await callback_query.answer("Неверный номер страницы.")
+        return
+
+    await callback_query.answer()
+    sorted_orders = await _get_admin_active_orders()
+    if not sorted_orders:
+        await callback_query.message.edit_text("Нет заказов, ожидающих подтверждения.")
+        return
+
+    text, markup = get_orders_page_text_and_markup(
+        sorted_orders, page, ADMIN_ORDERS_PAGE_SIZE,
+        title="<b>Заказы:</b>", include_user=True, callback_prefix="admin_orders_page"
+    )
+    await callback_query.message.edit_text(text, reply_markup=markup, parse_mode="HTML")
 
 @router.message(lambda m: m.text == "Обновить статус заказа")
 async def admin_update_status_menu(message: Message, state: FSMContext):
@@ -541,13 +926,13 @@ async def admin_update_status_menu(message: Message, state: FSMContext):
 
     await message.answer(
         "Введите OrderID и новый статус через пробел.\nНапример: `1 Доставлен`",
-        reply_markup=get_cancel_markup()
+        reply_markup=CANCEL_MARKUP
     )
     await state.set_state(AdminStates.UpdatingOrderStatus)
 
 @router.message(AdminStates.UpdatingOrderStatus)
 async def admin_process_update_status(message: Message, state: FSMContext):
-    if message.text.strip().lower() == CANCEL_TEXT.lower():
+    if _is_cancel(message):
         await handle_cancel(message, state)
         return
 
@@ -560,31 +945,23 @@ async def admin_process_update_status(message: Message, state: FSMContext):
     if len(parts) != 2:
         await message.answer(
             "Неверный формат. Введите OrderID и новый статус через пробел.\nНапример: `1 Доставлен`",
-            reply_markup=get_cancel_markup()
+            reply_markup=CANCEL_MARKUP
         )
         return
 
     order_id, new_status = parts
     if not order_id.isdigit():
-        await message.answer("OrderID должен быть числом.", reply_markup=get_cancel_markup())
+        await message.answer("OrderID должен быть числом.", reply_markup=CANCEL_MARKUP)
         return
 
-    success = await update_order_status(order_id, new_status)
-    if success:
-        all_orders = await get_all_orders()
-        order = next((o for o in all_orders if str(o.get('OrderID')) == order_id), None)
-        if order:
-            user_id_to_notify = int(order.get('user_id', 0))
-            await send_status_update(user_id_to_notify, order_id, new_status)
-            await message.answer(
-                f"Статус заказа №{order_id} обновлён на '{new_status}'. Уведомление пользователю отправлено.",
-                reply_markup=admin_menu
-            )
-        else:
-            await message.answer(
-                f"Статус заказа №{order_id} обновлён, но не удалось найти заказ для уведомления пользователя.",
-                reply_markup=admin_menu
-            )
+    updated_order = await update_order_status(order_id, new_status)
+    if updated_order is not None:
+        user_id_to_notify = int(updated_order.get('user_id', 0))
+        await send_status_update(user_id_to_notify, order_id, new_status)
+        await message.answer(
+            f"Статус заказа №{order_id} обновлён на '{new_status}'. Уведомление пользователю отправлено.",
+            reply_markup=admin_menu
+        )
     else:
         await message.answer("Не удалось обновить статус. Проверьте OrderID.", reply_markup=admin_menu)
 
@@ -594,7 +971,10 @@ async def admin_process_update_status(message: Message, state: FSMContext):
 async def main():
     global gc
     gc = await get_gspread_client()
-    await dp.start_polling(bot, skip_updates=True)
+    await _init_redis()
+    # Длинный таймаут getUpdates: на простое бот держит запрос открытым
+    # на стороне Telegram вместо частых пустых опросов
+    await dp.start_polling(bot, skip_updates=True, polling_timeout=30)
 
 if __name__ == "__main__":
     asyncio.run(main())
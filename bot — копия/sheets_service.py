@@ -0,0 +1,369 @@
+# sheets_service.py
+#
+# Общий слой работы с Google Sheets для combined_bot.py и admin_bot.py.
+# Держит один клиент, кэшированные листы, кэши данных и очереди записи,
+# чтобы оба бота не дублировали обращения к API и инвалидацию кэшей.
+
+import logging
+import asyncio
+import datetime
+import json
+import time
+import gspread
+import gspread_asyncio
+from oauth2client.service_account import ServiceAccountCredentials
+from dotenv import load_dotenv
+import os
+
+load_dotenv()
+
+SPREADSHEET_NAME = os.getenv("SPREADSHEET_NAME", "OrdersForCakes")
+ORDERS_SHEET_NAME = os.getenv("ORDERS_SHEET_NAME", "orders")
+CAKES_SHEET_NAME = os.getenv("CAKES_SHEET_NAME", "cakes")
+
+# Определение Scopes
+scope = [
+    "https://spreadsheets.google.com/feeds",
+    "https://www.googleapis.com/auth/spreadsheets",
+    "https://www.googleapis.com/auth/drive.file",
+    "https://www.googleapis.com/auth/drive"
+]
+
+def _read_credentials_file():
+    with open("credentials.json", "r", encoding="utf-8") as f:
+        return f.read()
+
+# Асинхронная инициализация клиента Google Sheets
+async def get_gspread_client():
+    # credentials.json читаем один раз в отдельном потоке, чтобы не блокировать
+    # event loop; при обновлении токена диск уже не трогается
+    creds_dict = json.loads(await asyncio.to_thread(_read_credentials_file))
+    agcm = gspread_asyncio.AsyncioGspreadClientManager(
+        lambda: ServiceAccountCredentials.from_json_keyfile_dict(creds_dict, scope)
+    )
+    return await agcm.authorize()
+
+# Клиент Google Sheets (устанавливается через init)
+gc = None
+
+# Кэшированные ссылки на таблицу и листы: открываем их один раз при старте,
+# чтобы не платить лишние обращения к API при каждом вызове
+_sh = None
+_orders_ws = None
+_cakes_ws = None
+# Заголовки листа заказов и отображение заголовок -> номер столбца
+# (заголовки между деплоями не меняются, читаем их один раз при старте)
+_orders_headers = []
+_header_col = {}
+# Индекс OrderID -> номер строки в листе заказов, чтобы не сканировать
+# весь лист при каждом обновлении статуса
+_orderid_row = {}
+# Следующий OrderID и число занятых строк: считаем в процессе, чтобы не
+# скачивать лист ради одного числа при каждом создании заказа
+_next_order_id = None
+_orders_row_count = 0
+_order_id_lock = asyncio.Lock()
+_sheets_lock = asyncio.Lock()
+
+# Ссылка на задачу фоновой записи: event loop хранит задачи слабо,
+# без ссылки цикл записи может быть собран GC
+_writer_task = None
+
+async def init(client):
+    """Принимает авторизованный клиент, открывает листы и запускает фоновую запись."""
+    global gc, _writer_task
+    gc = client
+    await _resolve_sheets()
+    _writer_task = asyncio.create_task(_order_writer_loop())
+
+async def _resolve_sheets():
+    """Открывает таблицу и оба листа и запоминает их в глобальных переменных."""
+    global _sh, _orders_ws, _cakes_ws, _next_order_id, _orders_row_count
+    _sh = await gc.open(SPREADSHEET_NAME)
+    _orders_ws = await _sh.worksheet(ORDERS_SHEET_NAME)
+    _cakes_ws = await _sh.worksheet(CAKES_SHEET_NAME)
+    headers = await _orders_ws.row_values(1)
+    _orders_headers.clear()
+    _orders_headers.extend(headers)
+    _header_col.clear()
+    _header_col.update({h: i + 1 for i, h in enumerate(headers)})
+    # Строим индекс строк по столбцу OrderID (первая строка — заголовки)
+    id_values = await _orders_ws.col_values(1)
+    _orderid_row.clear()
+    _orderid_row.update({v: i for i, v in enumerate(id_values, start=1) if i > 1 and v})
+    # Инициализируем счётчик OrderID по максимальному существующему ID
+    ids = [int(v) for v in id_values[1:] if v.isdigit()]
+    _next_order_id = max(ids) + 1 if ids else 1
+    _orders_row_count = len(id_values)
+    logging.info("Opened spreadsheet and cached worksheet handles.")
+
+def _reset_sheet_handles():
+    """Сбрасывает кэшированные листы (например, после ошибки API)."""
+    global _sh, _orders_ws, _cakes_ws
+    _sh = None
+    _orders_ws = None
+    _cakes_ws = None
+
+async def _get_orders_ws():
+    """Возвращает кэшированный лист 'orders', при необходимости переоткрывая его."""
+    if _orders_ws is None:
+        async with _sheets_lock:
+            if _orders_ws is None:
+                await _resolve_sheets()
+    return _orders_ws
+
+async def _get_cakes_ws():
+    """Возвращает кэшированный лист 'cakes', при необходимости переоткрывая его."""
+    if _cakes_ws is None:
+        async with _sheets_lock:
+            if _cakes_ws is None:
+                await _resolve_sheets()
+    return _cakes_ws
+
+# Время жизни кэшей (в секундах): каталог меняется редко, заказы — чаще
+CATALOG_CACHE_TTL = 300
+ORDERS_CACHE_TTL = 60
+
+# Кэши данных из Google Sheets: сами данные и время последнего обновления.
+# Блокировки нужны, чтобы при одновременном промахе кэша данные
+# запрашивались только одной корутиной (single-flight).
+_catalog_cache = {"data": None, "ts": 0.0}
+_orders_cache = {"data": None, "ts": 0.0, "by_user": {}}
+_catalog_lock = asyncio.Lock()
+_orders_lock = asyncio.Lock()
+
+def _invalidate_orders_cache():
+    """Сбрасывает кэш заказов после записи в лист."""
+    _orders_cache["ts"] = 0.0
+
+# Статус, с которым создаётся каждый новый заказ
+NEW_ORDER_STATUS = "ожидается подтверждение администратора"
+
+# Очередь отложенной записи заказов: подтверждение пользователю не ждёт,
+# пока строка доедет до Google Sheets
+_order_write_queue = asyncio.Queue()
+
+async def _order_writer_loop():
+    """Фоновая задача: переносит заказы из очереди в лист 'orders'."""
+    global _orders_row_count
+    while True:
+        row = await _order_write_queue.get()
+        try:
+            orders_sheet = await _get_orders_ws()
+            await orders_sheet.append_row(row)
+            # Индекс строк и кэш трогаем только после того, как строка
+            # реально легла в лист: иначе гонка чтения с отложенной
+            # записью закэширует список без нового заказа
+            _orders_row_count += 1
+            _orderid_row[str(row[0])] = _orders_row_count
+            _invalidate_orders_cache()
+            logging.info(f"Appended order {row[0]} to sheet.")
+        except Exception as e:
+            # Любая ошибка записи (не только APIError): сбрасываем листы,
+            # следующее обращение переоткроет их и перестроит индекс строк
+            # по фактическому содержимому листа
+            _reset_sheet_handles()
+            logging.error(f"Ошибка при записи заказа {row[0]}: {e}")
+        finally:
+            _order_write_queue.task_done()
+
+async def get_catalog_of_cakes():
+    """Считывает каталог тортов из листа 'cakes' (с кэшированием)."""
+    if _catalog_cache["data"] is not None and time.monotonic() - _catalog_cache["ts"] < CATALOG_CACHE_TTL:
+        return _catalog_cache["data"]
+    async with _catalog_lock:
+        # Пока ждали блокировку, кэш мог обновить кто-то другой
+        if _catalog_cache["data"] is not None and time.monotonic() - _catalog_cache["ts"] < CATALOG_CACHE_TTL:
+            return _catalog_cache["data"]
+        try:
+            cakes_sheet = await _get_cakes_ws()
+            data = await cakes_sheet.get_all_records()
+            logging.info(f"Fetched {len(data)} cakes from catalog.")
+            _catalog_cache["data"] = data
+            _catalog_cache["ts"] = time.monotonic()
+            return data
+        except gspread.exceptions.APIError as e:
+            # Токен мог протухнуть — сбрасываем листы, следующий вызов переоткроет их
+            _reset_sheet_handles()
+            logging.error(f"Ошибка при получении каталога тортов: {e}")
+            return []
+        except Exception as e:
+            logging.error(f"Ошибка при получении каталога тортов: {e}")
+            return []
+
+async def get_all_orders():
+    """Возвращает все заказы из листа 'orders' (с кэшированием)."""
+    if _orders_cache["data"] is not None and time.monotonic() - _orders_cache["ts"] < ORDERS_CACHE_TTL:
+        return _orders_cache["data"]
+    async with _orders_lock:
+        if _orders_cache["data"] is not None and time.monotonic() - _orders_cache["ts"] < ORDERS_CACHE_TTL:
+            return _orders_cache["data"]
+        try:
+            orders_sheet = await _get_orders_ws()
+            all_orders = await orders_sheet.get_all_records()
+            logging.info(f"Fetched {len(all_orders)} orders from Google Sheets.")
+            # Группируем заказы по user_id один раз при обновлении кэша,
+            # чтобы выборка заказов пользователя не сканировала весь список
+            by_user = {}
+            for order in all_orders:
+                by_user.setdefault(str(order.get('user_id', '')).strip(), []).append(order)
+            _orders_cache["data"] = all_orders
+            _orders_cache["by_user"] = by_user
+            _orders_cache["ts"] = time.monotonic()
+            return all_orders
+        except gspread.exceptions.APIError as e:
+            _reset_sheet_handles()
+            logging.error(f"Ошибка при получении всех заказов: {e}")
+            return []
+        except Exception as e:
+            logging.error(f"Ошибка при получении всех заказов: {e}")
+            return []
+
+async def get_all_orders_by_user(user_id):
+    """Возвращает все заказы, оформленные на заданный user_id."""
+    await get_all_orders()  # обновляет кэш и индекс при необходимости
+    user_orders = _orders_cache["by_user"].get(str(user_id).strip(), [])
+    logging.info(f"User {user_id} has {len(user_orders)} orders.")
+    return user_orders
+
+async def get_active_orders():
+    """Возвращает заказы, ещё не имеющие статус 'Доставлен'.
+
+    При свежем кэше просто фильтрует его. При промахе читает только столбец
+    статусов и точечно забирает активные строки, чтобы объём трафика зависел
+    от размера очереди, а не от всего архива заказов.
+    """
+    if _orders_cache["data"] is not None and time.monotonic() - _orders_cache["ts"] < ORDERS_CACHE_TTL:
+        return [o for o in _orders_cache["data"] if o.get('status') != "Доставлен"]
+    try:
+        orders_sheet = await _get_orders_ws()
+        status_col = _header_col.get('status')
+        if status_col is None or not _orders_headers:
+            return [o for o in await get_all_orders() if o.get('status') != "Доставлен"]
+        statuses = await orders_sheet.col_values(status_col)
+        active_rows = [i for i, s in enumerate(statuses, start=1) if i > 1 and s != "Доставлен"]
+        if not active_rows:
+            return []
+        row_groups = await orders_sheet.batch_get([f"{i}:{i}" for i in active_rows])
+        orders = []
+        for group in row_groups:
+            for row in group:
+                padded = list(row) + [''] * (len(_orders_headers) - len(row))
+                orders.append(dict(zip(_orders_headers, padded)))
+        logging.info(f"Fetched {len(orders)} active orders from Google Sheets.")
+        return orders
+    except gspread.exceptions.APIError as e:
+        _reset_sheet_handles()
+        logging.error(f"Ошибка при получении активных заказов: {e}")
+        return []
+    except Exception as e:
+        logging.error(f"Ошибка при получении активных заказов: {e}")
+        return []
+
+async def create_new_order(user_id, user_name, cake, taste, size, decor):
+    """Создаёт новый заказ: резервирует OrderID и ставит строку в очередь записи.
+
+    Сам append в лист выполняет фоновая задача _order_writer_loop, поэтому
+    подтверждение заказа возвращается пользователю без ожидания Sheets.
+    """
+    global _next_order_id
+    try:
+        # OrderID выдаётся из счётчика процесса — без скачивания листа
+        async with _order_id_lock:
+            order_id = _next_order_id
+            _next_order_id += 1
+        current_date = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        # Поля приходят уже нормализованными (strip выполняется один раз
+        # на входе в FSM), поэтому здесь строки не пересобираем
+        row = (
+            order_id,
+            str(user_id),
+            user_name,
+            cake['name'],
+            cake['price'],
+            taste,
+            size,
+            decor,
+            NEW_ORDER_STATUS,
+            current_date  # Новое поле даты
+        )
+        # Индекс строк и кэш обновит _order_writer_loop после успешного
+        # append — здесь строка ещё не существует на листе
+        _order_write_queue.put_nowait(list(row))
+        logging.info(f"Created new order {order_id} for user {user_id}.")
+        return order_id
+    except Exception as e:
+        logging.error(f"Ошибка при создании заказа: {e}")
+        return None
+
+# Буфер отложенных обновлений статусов: близкие по времени обновления
+# уезжают в Sheets одним batch_update вместо запроса на каждую ячейку
+_pending_status_updates = []
+_status_flush_task = None
+STATUS_FLUSH_DELAY = 0.2
+
+async def _flush_status_updates():
+    """Отправляет накопленные обновления статусов одним batch_update."""
+    global _status_flush_task
+    await asyncio.sleep(STATUS_FLUSH_DELAY)
+    updates = _pending_status_updates[:]
+    _pending_status_updates.clear()
+    _status_flush_task = None
+    if not updates:
+        return
+    try:
+        orders_sheet = await _get_orders_ws()
+        await orders_sheet.batch_update(updates, value_input_option='USER_ENTERED')
+        # Кэш сбрасываем только после фактической записи: сброс при
+        # постановке в очередь позволял перечитать лист до flush и
+        # закэшировать старый статус со свежей меткой времени
+        _invalidate_orders_cache()
+        logging.info(f"Flushed {len(updates)} status update(s) to sheet.")
+    except gspread.exceptions.APIError as e:
+        _reset_sheet_handles()
+        logging.error(f"Ошибка при пакетном обновлении статусов: {e}")
+    except Exception as e:
+        logging.error(f"Ошибка при пакетном обновлении статусов: {e}")
+
+async def update_order_status(order_id, new_status):
+    """Обновляет статус заказа по его OrderID."""
+    global _status_flush_task
+    try:
+        orders_sheet = await _get_orders_ws()
+        status_col = _header_col.get('status')
+        if status_col is None:
+            logging.error("Столбец 'status' не найден в листе.")
+            return False
+
+        # Номер строки берём из индекса; поиск по листу — только если
+        # заказ появился в обход нашего процесса
+        row = _orderid_row.get(str(order_id))
+        if row is None:
+            cell = await orders_sheet.find(str(order_id), in_column=1)
+            if cell is None:
+                logging.warning(f"OrderID {order_id} не найден.")
+                return False
+            row = cell.row
+            _orderid_row[str(order_id)] = row
+        _pending_status_updates.append({
+            "range": gspread.utils.rowcol_to_a1(row, status_col),
+            "values": [[new_status]],
+        })
+        if _status_flush_task is None:
+            _status_flush_task = asyncio.create_task(_flush_status_updates())
+        # Закэшированный заказ правим на месте (by_user хранит те же
+        # словари), чтобы чтения до flush уже видели новый статус
+        if _orders_cache["data"] is not None:
+            for order in _orders_cache["data"]:
+                if str(order.get('OrderID', '')) == str(order_id):
+                    order['status'] = new_status
+                    break
+        logging.info(f"Updated OrderID {order_id} status to '{new_status}'.")
+        return True
+    except gspread.exceptions.APIError as e:
+        _reset_sheet_handles()
+        logging.error(f"Ошибка при обновлении статуса заказа {order_id}: {e}")
+        return False
+    except Exception as e:
+        logging.error(f"Ошибка при обновлении статуса заказа {order_id}: {e}")
+        return False
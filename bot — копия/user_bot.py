@@ -1,10 +1,12 @@
 import logging
 import asyncio
 import datetime
+import time
+import gspread
 import gspread_asyncio
 from oauth2client.service_account import ServiceAccountCredentials
-from aiogram import Bot, Dispatcher, types
-from aiogram.types import ReplyKeyboardMarkup, KeyboardButton, ReplyKeyboardRemove
+from aiogram import Bot, Dispatcher, types, F
+from aiogram.types import ReplyKeyboardMarkup, KeyboardButton, ReplyKeyboardRemove, InputMediaPhoto
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import StatesGroup, State
@@ -24,11 +26,12 @@ logging.basicConfig(level=logging.INFO)
 # Получение токена и админ ID из переменных окружения
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 ADMIN_IDS = os.getenv("ADMIN_IDS", "")
-# Преобразуем строку с ID в список целых чисел
+# Преобразуем строку с ID в frozenset: is_admin вызывается в каждом
+# обработчике, и проверка принадлежности множеству выполняется за O(1)
 try:
-    ADMIN_IDS = [int(id_.strip()) for id_ in ADMIN_IDS.split(",") if id_.strip().isdigit()]
+    ADMIN_IDS = frozenset(int(id_.strip()) for id_ in ADMIN_IDS.split(",") if id_.strip().isdigit())
 except ValueError:
-    ADMIN_IDS = []
+    ADMIN_IDS = frozenset()
     logging.error("Ошибка при парсинге ADMIN_IDS. Убедитесь, что они являются числами и разделены запятыми.")
 
 if not ADMIN_IDS:
@@ -73,6 +76,40 @@ class AdminStates(StatesGroup):
 # Глобальная переменная для Google Sheets
 gc = None
 
+# Кэшированные хэндлы таблицы и листов: open и worksheet — отдельные
+# HTTP-запросы, поэтому открываем их один раз, а не в каждом вызове
+_sh = None
+_orders_ws = None
+_cakes_ws = None
+_sheets_lock = asyncio.Lock()
+
+def _reset_sheets():
+    """Сбрасывает хэндлы листов; следующий вызов переоткроет таблицу."""
+    global _sh, _orders_ws, _cakes_ws
+    _sh = None
+    _orders_ws = None
+    _cakes_ws = None
+
+async def _get_orders_sheet():
+    global _sh, _orders_ws
+    if _orders_ws is None:
+        async with _sheets_lock:
+            if _orders_ws is None:
+                if _sh is None:
+                    _sh = await gc.open(SPREADSHEET_NAME)
+                _orders_ws = await _sh.worksheet(ORDERS_SHEET_NAME)
+    return _orders_ws
+
+async def _get_cakes_sheet():
+    global _sh, _cakes_ws
+    if _cakes_ws is None:
+        async with _sheets_lock:
+            if _cakes_ws is None:
+                if _sh is None:
+                    _sh = await gc.open(SPREADSHEET_NAME)
+                _cakes_ws = await _sh.worksheet(CAKES_SHEET_NAME)
+    return _cakes_ws
+
 # Проверка на администратора
 def is_admin(user_id: int) -> bool:
     return user_id in ADMIN_IDS
@@ -98,66 +135,189 @@ admin_menu = ReplyKeyboardMarkup(
     resize_keyboard=True
 )
 
+# Клавиатуры шагов заказа неизменяемы — собираем их один раз при
+# импорте, а не в каждом обработчике
+CANCEL_KB = ReplyKeyboardMarkup(
+    keyboard=[
+        [KeyboardButton(text="Отмена")]
+    ],
+    resize_keyboard=True
+)
+
+YES_NO_KB = ReplyKeyboardMarkup(
+    keyboard=[
+        [KeyboardButton(text="Да"), KeyboardButton(text="Нет")]
+    ],
+    resize_keyboard=True
+)
+
+# Шаблоны блока заказа: разбираются format-машиной один раз при импорте,
+# в циклах вывода остаётся только подстановка через format_map
+_USER_ORDER_TPL = (
+    "№ {OrderID}\n"
+    "Торт: {cake_name}\n"
+    "Цена: {price} руб.\n"
+    "Вкус: {taste}\n"
+    "Размер: {size} персон\n"
+    "Декор: {decor}\n"
+    "Статус: {status}\n"
+    "Дата: {date}\n"
+    "-----------------------\n"
+)
+
+_ADMIN_ORDER_TPL = (
+    "№ {OrderID}\n"
+    "Пользователь: @{user_name} (ID: {user_id})\n"
+    "Торт: {cake_name}\n"
+    "Цена: {price} руб.\n"
+    "Вкус: {taste}\n"
+    "Размер: {size} персон\n"
+    "Декор: {decor}\n"
+    "Статус: {status}\n"
+    "Дата: {date}\n"
+    "-----------------------\n"
+)
+
+# Время жизни кэшей (в секундах): каталог меняется редко, заказы — чаще
+CATALOG_CACHE_TTL = 60
+ORDERS_CACHE_TTL = 10
+
+# Кэши прочитанных данных: значение и время последнего обновления.
+# Блокировки нужны, чтобы при одновременном промахе кэша лист
+# скачивала только одна корутина.
+_catalog_cache = {"data": None, "ts": 0.0, "by_lname": {}}
+_orders_cache = {"data": None, "ts": 0.0}
+_catalog_lock = asyncio.Lock()
+_orders_lock = asyncio.Lock()
+
+def _invalidate_orders_cache():
+    """Сбрасывает кэш заказов после записи в лист."""
+    _orders_cache["ts"] = 0.0
+
 # Вспомогательные функции работы с Google Sheets
 async def get_catalog_of_cakes():
-    try:
-        sh = await gc.open(SPREADSHEET_NAME)
-        cakes_sheet = await sh.worksheet(CAKES_SHEET_NAME)
-        data = await cakes_sheet.get_all_records()
-        logging.info(f"Fetched {len(data)} cakes from catalog.")
-        return data
-    except Exception as e:
-        logging.error(f"Ошибка при получении каталога тортов: {e}")
-        return []
+    if _catalog_cache["data"] is not None and time.monotonic() - _catalog_cache["ts"] < CATALOG_CACHE_TTL:
+        return _catalog_cache["data"]
+    async with _catalog_lock:
+        # Пока ждали блокировку, кэш мог обновиться
+        if _catalog_cache["data"] is not None and time.monotonic() - _catalog_cache["ts"] < CATALOG_CACHE_TTL:
+            return _catalog_cache["data"]
+        try:
+            cakes_sheet = await _get_cakes_sheet()
+            data = await cakes_sheet.get_all_records()
+            logging.info(f"Fetched {len(data)} cakes from catalog.")
+            _catalog_cache["data"] = data
+            # Индекс по имени в нижнем регистре: поиск выбранного торта
+            # идёт за O(1) вместо линейного перебора каталога
+            _catalog_cache["by_lname"] = {str(c.get('name', '')).strip().lower(): c for c in data}
+            _catalog_cache["ts"] = time.monotonic()
+            return data
+        except Exception as e:
+            logging.error(f"Ошибка при получении каталога тортов: {e}")
+            _reset_sheets()
+            return []
 
 async def get_all_orders():
-    try:
-        sh = await gc.open(SPREADSHEET_NAME)
-        orders_sheet = await sh.worksheet(ORDERS_SHEET_NAME)
-        all_orders = await orders_sheet.get_all_records()
-        logging.info(f"Fetched {len(all_orders)} orders from Google Sheets.")
-        return all_orders
-    except Exception as e:
-        logging.error(f"Ошибка при получении всех заказов: {e}")
-        return []
+    if _orders_cache["data"] is not None and time.monotonic() - _orders_cache["ts"] < ORDERS_CACHE_TTL:
+        return _orders_cache["data"]
+    async with _orders_lock:
+        if _orders_cache["data"] is not None and time.monotonic() - _orders_cache["ts"] < ORDERS_CACHE_TTL:
+            return _orders_cache["data"]
+        try:
+            orders_sheet = await _get_orders_sheet()
+            all_orders = await orders_sheet.get_all_records()
+            logging.info(f"Fetched {len(all_orders)} orders from Google Sheets.")
+            _orders_cache["data"] = all_orders
+            _orders_cache["ts"] = time.monotonic()
+            return all_orders
+        except Exception as e:
+            logging.error(f"Ошибка при получении всех заказов: {e}")
+            _reset_sheets()
+            return []
 
 async def get_all_orders_by_user(user_id):
-    try:
-        sh = await gc.open(SPREADSHEET_NAME)
-        orders_sheet = await sh.worksheet(ORDERS_SHEET_NAME)
-        all_orders = await orders_sheet.get_all_records()
-        logging.info(f"Fetched {len(all_orders)} orders from Google Sheets.")
-        user_orders = [
-            o for o in all_orders
-            if str(o.get('user_id', '')).strip() == str(user_id).strip()
-        ]
-        logging.info(f"User {user_id} has {len(user_orders)} orders.")
-        return user_orders
-    except Exception as e:
-        logging.error(f"Ошибка при получении заказов пользователя {user_id}: {e}")
-        return []
+    # Выборка по пользователю идёт из общего кэша заказов,
+    # отдельный запрос к API не нужен
+    all_orders = await get_all_orders()
+    user_orders = [
+        o for o in all_orders
+        if str(o.get('user_id', '')).strip() == str(user_id).strip()
+    ]
+    logging.info(f"User {user_id} has {len(user_orders)} orders.")
+    return user_orders
+
+# Следующий OrderID храним в памяти процесса: холодный старт читает
+# только столбец ID, дальше номера выдаются без обращения к листу
+# (и без гонки между одновременными заказами)
+_next_order_id = None
+_order_id_lock = asyncio.Lock()
+
+async def _reserve_order_id():
+    global _next_order_id
+    async with _order_id_lock:
+        if _next_order_id is None:
+            orders_sheet = await _get_orders_sheet()
+            ids = await orders_sheet.col_values(1)
+            numeric = [int(v) for v in ids[1:] if v.isdigit()]
+            _next_order_id = max(numeric) + 1 if numeric else 1
+            # Столбец уже прочитан — заодно прогреваем карту строк
+            _rebuild_row_map(ids)
+        order_id = _next_order_id
+        _next_order_id += 1
+        return order_id
+
+# Очередь строк на запись: обработчик заказа не ждёт round trip к
+# Google Sheets, фоновая задача сбрасывает накопившиеся строки одним
+# append_rows
+_order_write_queue = asyncio.Queue()
+
+async def order_writer():
+    """Фоновая задача: пишет заказы из очереди в лист пачками."""
+    while True:
+        rows = [await _order_write_queue.get()]
+        # Даём очереди немного накопиться, чтобы объединить близкие заказы
+        try:
+            while True:
+                rows.append(await asyncio.wait_for(_order_write_queue.get(), timeout=0.5))
+        except asyncio.TimeoutError:
+            pass
+        try:
+            orders_sheet = await _get_orders_sheet()
+            await orders_sheet.append_rows(rows, value_input_option='USER_ENTERED')
+            # Новые строки легли в конец листа — дописываем их в карту
+            # OrderID -> строка, чтобы обновление статуса шло без чтений
+            global _row_count
+            for row in rows:
+                _row_count += 1
+                _orderid_to_row[str(row[0])] = _row_count
+            _invalidate_orders_cache()
+            logging.info(f"Записано {len(rows)} заказ(ов) одним append_rows.")
+        except Exception as e:
+            logging.error(f"Ошибка при фоновой записи заказов: {e}")
+            _reset_sheets()
+        finally:
+            for _ in rows:
+                _order_write_queue.task_done()
 
 async def create_new_order(user_id, user_name, cake, taste, size, decor):
     try:
-        sh = await gc.open(SPREADSHEET_NAME)
-        orders_sheet = await sh.worksheet(ORDERS_SHEET_NAME)
-        all_values = await orders_sheet.get_all_values()
-        if len(all_values) < 2:
-            order_id = 1
-        else:
-            last_row = all_values[-1]
-            order_id = int(last_row[0]) + 1
+        order_id = await _reserve_order_id()
         status = "ожидается подтверждение администратора"
         current_date = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        await orders_sheet.append_row([
+        # Поля приходят уже очищенными (strip выполняется один раз
+        # в обработчиках состояний), поэтому здесь строки не пересобираем
+        cake_name = cake['name']
+        cake_price = cake['price']
+        # Строка уходит в очередь, запись выполнит order_writer
+        _order_write_queue.put_nowait([
             order_id,
-            str(user_id).strip(),
-            user_name.strip(),
-            cake['name'].strip(),
-            str(cake['price']).strip(),
-            taste.strip(),
-            str(size).strip(),
-            decor.strip(),
+            str(user_id),
+            user_name,
+            cake_name,
+            str(cake_price),
+            taste,
+            size,
+            decor,
             status,
             current_date
         ])
@@ -167,28 +327,78 @@ async def create_new_order(user_id, user_name, cake, taste, size, decor):
         logging.error(f"Ошибка при создании заказа: {e}")
         return None
 
+# Кэш заголовков и отображение OrderID -> номер строки: заполняются
+# лениво из одного столбца и поддерживаются при записи новых заказов,
+# поэтому в типичном случае обновление статуса не читает лист вообще
+_headers_cache = None
+_status_col = None
+_orderid_to_row = {}
+_row_count = 0
+
+def _rebuild_row_map(ids):
+    """Перестраивает отображение OrderID -> строка по столбцу ID."""
+    global _row_count
+    _orderid_to_row.clear()
+    _orderid_to_row.update({v: i for i, v in enumerate(ids, start=1) if i > 1 and v})
+    _row_count = len(ids)
+
+async def _get_status_col(orders_sheet):
+    global _headers_cache, _status_col
+    if _status_col is None:
+        _headers_cache = await orders_sheet.row_values(1)
+        if 'status' not in _headers_cache:
+            logging.error("Столбец 'status' не найден в листе.")
+            return None
+        _status_col = _headers_cache.index('status') + 1
+    return _status_col
+
+async def _find_order_row(orders_sheet, order_id):
+    """Возвращает номер строки заказа, при промахе перечитывает столбец ID."""
+    row = _orderid_to_row.get(str(order_id))
+    if row is None:
+        ids = await orders_sheet.col_values(1)
+        _rebuild_row_map(ids)
+        row = _orderid_to_row.get(str(order_id))
+    return row
+
 async def update_order_status(order_id, new_status):
+    """Обновляет статус заказа; возвращает (успех, user_id заказа)."""
     try:
-        sh = await gc.open(SPREADSHEET_NAME)
-        orders_sheet = await sh.worksheet(ORDERS_SHEET_NAME)
-        all_orders = await orders_sheet.get_all_records()
-
-        headers = await orders_sheet.row_values(1)
-        if 'status' not in headers:
-            logging.error("Столбец 'status' не найден в листе.")
-            return False
-        status_col = headers.index('status') + 1
-
-        for idx, order in enumerate(all_orders, start=2):
-            if str(order.get('OrderID')) == str(order_id):
-                await orders_sheet.update_cell(idx, status_col, new_status)
-                logging.info(f"Updated OrderID {order_id} status to '{new_status}'.")
-                return True
-        logging.warning(f"OrderID {order_id} не найден.")
-        return False
+        orders_sheet = await _get_orders_sheet()
+
+        status_col = await _get_status_col(orders_sheet)
+        if status_col is None:
+            return False, None
+
+        row = await _find_order_row(orders_sheet, order_id)
+        if row is None:
+            logging.warning(f"OrderID {order_id} не найден.")
+            return False, None
+
+        # Одна точечная запись вместо скачивания всех записей + update_cell
+        await orders_sheet.batch_update([{
+            'range': gspread.utils.rowcol_to_a1(row, status_col),
+            'values': [[new_status]],
+        }])
+        _invalidate_orders_cache()
+
+        # user_id нужен вызывающему для уведомления — читаем одну строку
+        # вместо скачивания всех заказов
+        user_id = None
+        try:
+            row_values = await orders_sheet.row_values(row)
+            uid_idx = _headers_cache.index('user_id')
+            if uid_idx < len(row_values) and str(row_values[uid_idx]).strip().isdigit():
+                user_id = int(row_values[uid_idx])
+        except Exception as e:
+            logging.error(f"Не удалось прочитать user_id заказа {order_id}: {e}")
+
+        logging.info(f"Updated OrderID {order_id} status to '{new_status}'.")
+        return True, user_id
     except Exception as e:
         logging.error(f"Ошибка при обновлении статуса заказа {order_id}: {e}")
-        return False
+        _reset_sheets()
+        return False, None
 
 async def send_status_update(user_id, order_id, new_status):
     try:
@@ -219,7 +429,7 @@ async def handle_start(message: Message, state: FSMContext):
             reply_markup=user_menu
         )
 
-@router.message(lambda m: m.text == "Отмена")
+@router.message(F.text == "Отмена")
 async def handle_cancel(message: Message, state: FSMContext):
     """Кнопка «Отмена» для возврата в главное меню."""
     await state.clear()
@@ -230,88 +440,93 @@ async def handle_cancel(message: Message, state: FSMContext):
         await message.answer("Возврат в пользовательское меню.", reply_markup=user_menu)
 
 # === Пользовательское меню ===
-@router.message(lambda m: m.text == "Сделать заказ")
+@router.message(F.text == "Сделать заказ")
 async def user_make_order(message: Message, state: FSMContext):
     """Начало оформления заказа."""
     user_id = message.from_user.id
     if is_admin(user_id):
         await message.answer("Администратор не может использовать этот функционал.")
-        #return
+        return
 
     catalog = await get_catalog_of_cakes()
     if not catalog:
         await message.answer("Каталог тортов пока пуст.")
         return
 
-    # Выводим список тортов
+    # Выводим список тортов: описания без фото собираем в общие
+    # сообщения, фото отправляются медиагруппами до 10 штук
+    text_buffer = ""
+    media = []
     for cake in catalog:
         text = f"<b>{cake['name']}</b>\nЦена: {cake['price']} руб.\n{cake['description']}"
         photo = cake.get('photo')
         if photo:
-            await message.answer_photo(photo=photo, caption=text, parse_mode='HTML')
+            media.append(InputMediaPhoto(media=photo, caption=text, parse_mode='HTML'))
+            if len(media) == 10:
+                await message.answer_media_group(media=media)
+                media = []
         else:
-            await message.answer(text, parse_mode='HTML')
+            block = text + "\n\n"
+            # Пустой буфер не отправляем: answer("") падает с BadRequest
+            if text_buffer and len(text_buffer) + len(block) > 3900:
+                await message.answer(text_buffer, parse_mode='HTML')
+                text_buffer = ""
+            text_buffer += block
+    if len(media) == 1:
+        # Медиагруппа требует минимум два элемента
+        await message.answer_photo(photo=media[0].media, caption=media[0].caption, parse_mode='HTML')
+    elif media:
+        await message.answer_media_group(media=media)
+    if text_buffer:
+        await message.answer(text_buffer, parse_mode='HTML')
 
     await message.answer(
         "Введите название торта:",
-        reply_markup=ReplyKeyboardMarkup(
-            keyboard=[
-                [KeyboardButton(text="Отмена")]
-            ],
-            resize_keyboard=True
-        )
+        reply_markup=CANCEL_KB
     )
     await state.set_state(OrderStates.ChoosingCake)
 
-@router.message(lambda m: m.text == "Статус заказов")
+@router.message(F.text == "Статус заказов")
 async def user_check_status(message: Message, state: FSMContext):
     """Проверка статусов заказов пользователя."""
     user_id = message.from_user.id
     if is_admin(user_id):
         await message.answer("Администратор не может использовать этот функционал.")
-        #return
+        return
 
     orders = await get_all_orders_by_user(user_id)
     if not orders:
         await message.answer("У вас ещё нет заказов.", reply_markup=user_menu)
         return
 
-    # Сортировка по дате
+    # Сортировка по дате: формат "YYYY-MM-DD HH:MM:SS" совместим с ISO,
+    # fromisoformat парсит его в разы быстрее strptime
     try:
         sorted_orders = sorted(
             orders,
-            key=lambda x: datetime.datetime.strptime(x['date'], "%Y-%m-%d %H:%M:%S"),
+            key=lambda x: datetime.datetime.fromisoformat(x['date']),
             reverse=True
         )
     except Exception as e:
         logging.error(f"Ошибка при сортировке заказов: {e}")
         sorted_orders = orders
 
-    # Вывод
-    page_size = 5
-    total = len(sorted_orders)
-    pages = (total + page_size - 1) // page_size
-
-    for page in range(pages):
-        start = page * page_size
-        end = start + page_size
-        chunk = sorted_orders[start:end]
-
-        text = "<b>Ваши заказы:</b>\n\n"
-        for o in chunk:
-            text += (
-                f"№ {o['OrderID']}\n"
-                f"Торт: {o['cake_name']}\n"
-                f"Цена: {o['price']} руб.\n"
-                f"Вкус: {o['taste']}\n"
-                f"Размер: {o['size']} персон\n"
-                f"Декор: {o['decor']}\n"
-                f"Статус: {o['status']}\n"
-                f"Дата: {o['date']}\n"
-                "-----------------------\n"
-            )
-
-        await message.answer(text, parse_mode='HTML', reply_markup=user_menu)
+    # Вывод: блоки копим в список и склеиваем через join перед отправкой
+    # (без квадратичной пересборки строки на каждом шаге); сообщение
+    # уходит, только когда следующий блок не влезает в лимит Telegram
+    parts = ["<b>Ваши заказы:</b>\n\n"]
+    length = len(parts[0])
+    for o in sorted_orders:
+        block = _USER_ORDER_TPL.format_map(o)
+        if length + len(block) > 3900:
+            await message.answer("".join(parts), parse_mode='HTML', reply_markup=user_menu)
+            parts = []
+            length = 0
+        parts.append(block)
+        length += len(block)
+
+    if parts:
+        await message.answer("".join(parts), parse_mode='HTML', reply_markup=user_menu)
 
 # === Обработчики состояний оформления заказа (OrderStates) ===
 @router.message(OrderStates.ChoosingCake)
@@ -323,11 +538,11 @@ async def user_choosing_cake(message: Message, state: FSMContext):
     user_id = message.from_user.id
     if is_admin(user_id):
         await message.answer("Администратор не может использовать этот функционал.")
-        #return
+        return
 
     chosen_cake_name = message.text.strip()
-    catalog = await get_catalog_of_cakes()
-    chosen_cake = next((c for c in catalog if c['name'].lower() == chosen_cake_name.lower()), None)
+    await get_catalog_of_cakes()  # прогреваем кэш и индекс при необходимости
+    chosen_cake = _catalog_cache["by_lname"].get(chosen_cake_name.lower())
     if not chosen_cake:
         await message.answer("Такого торта нет в каталоге. Попробуйте ещё раз или нажмите Отмена.")
         return
@@ -335,12 +550,7 @@ async def user_choosing_cake(message: Message, state: FSMContext):
     await state.update_data(chosen_cake=chosen_cake)
     await message.answer(
         "Какой вкус вы предпочитаете?",
-        reply_markup=ReplyKeyboardMarkup(
-            keyboard=[
-                [KeyboardButton(text="Отмена")]
-            ],
-            resize_keyboard=True
-        )
+        reply_markup=CANCEL_KB
     )
     await state.set_state(OrderStates.ChoosingTaste)
 
@@ -353,12 +563,7 @@ async def user_choosing_taste(message: Message, state: FSMContext):
     await state.update_data(taste=message.text.strip())
     await message.answer(
         "На сколько персон?",
-        reply_markup=ReplyKeyboardMarkup(
-            keyboard=[
-                [KeyboardButton(text="Отмена")]
-            ],
-            resize_keyboard=True
-        )
+        reply_markup=CANCEL_KB
     )
     await state.set_state(OrderStates.ChoosingSize)
 
@@ -375,12 +580,7 @@ async def user_choosing_size(message: Message, state: FSMContext):
     await state.update_data(size=size)
     await message.answer(
         "Какой декор? (например: ягоды, фигурки...)",
-        reply_markup=ReplyKeyboardMarkup(
-            keyboard=[
-                [KeyboardButton(text="Отмена")]
-            ],
-            resize_keyboard=True
-        )
+        reply_markup=CANCEL_KB
     )
     await state.set_state(OrderStates.ChoosingDecor)
 
@@ -390,8 +590,9 @@ async def user_choosing_decor(message: Message, state: FSMContext):
         await handle_cancel(message, state)
         return
 
-    await state.update_data(decor=message.text.strip())
-    data = await state.get_data()
+    # update_data возвращает объединённые данные состояния — отдельный
+    # get_data (ещё один round trip к хранилищу FSM) не нужен
+    data = await state.update_data(decor=message.text.strip())
     cake = data['chosen_cake']
     taste = data['taste']
     size = data['size']
@@ -408,12 +609,7 @@ async def user_choosing_decor(message: Message, state: FSMContext):
     await message.answer(
         confirmation_text,
         parse_mode='HTML',
-        reply_markup=ReplyKeyboardMarkup(
-            keyboard=[
-                [KeyboardButton(text="Да"), KeyboardButton(text="Нет")]
-            ],
-            resize_keyboard=True
-        )
+        reply_markup=YES_NO_KB
     )
     await state.set_state(OrderStates.Confirming)
 
@@ -443,27 +639,28 @@ async def user_confirming_order(message: Message, state: FSMContext):
                 "Ожидается подтверждение администратора.",
                 reply_markup=user_menu
             )
-            # Уведомление администраторов
+            # Уведомление администраторов: рассылаем параллельно, а не
+            # по одному round trip на каждого
             current_date = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            for admin_id in ADMIN_IDS:
-                try:
-                    await bot.send_message(
-                        chat_id=admin_id,
-                        text=(
-                            f"📦 <b>Новый заказ</b>\n\n"
-                            f"№ {order_id}\n"
-                            f"Пользователь: @{user_name} (ID: {user_id})\n"
-                            f"Торт: {data['chosen_cake']['name']}\n"
-                            f"Вкус: {data['taste']}\n"
-                            f"Размер: {data['size']} персон\n"
-                            f"Декор: {data['decor']}\n"
-                            f"Статус: ожидается подтверждение администратора\n"
-                            f"Дата: {current_date}"
-                        ),
-                        parse_mode='HTML'
-                    )
-                except Exception as e:
-                    logging.error(f"Не удалось отправить уведомление администратору {admin_id}: {e}")
+            notif = (
+                f"📦 <b>Новый заказ</b>\n\n"
+                f"№ {order_id}\n"
+                f"Пользователь: @{user_name} (ID: {user_id})\n"
+                f"Торт: {data['chosen_cake']['name']}\n"
+                f"Вкус: {data['taste']}\n"
+                f"Размер: {data['size']} персон\n"
+                f"Декор: {data['decor']}\n"
+                f"Статус: ожидается подтверждение администратора\n"
+                f"Дата: {current_date}"
+            )
+            tasks = [
+                bot.send_message(chat_id=admin_id, text=notif, parse_mode='HTML')
+                for admin_id in ADMIN_IDS
+            ]
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+            for admin_id, result in zip(ADMIN_IDS, results):
+                if isinstance(result, Exception):
+                    logging.error(f"Не удалось отправить уведомление администратору {admin_id}: {result}")
         else:
             await message.answer("Произошла ошибка при оформлении заказа.", reply_markup=user_menu)
         await state.clear()
@@ -474,7 +671,7 @@ async def user_confirming_order(message: Message, state: FSMContext):
     else:
         await message.answer("Введите «Да» или «Нет».")
 
-@router.message(lambda m: m.text == "Просмотреть заказы")
+@router.message(F.text == "Просмотреть заказы")
 async def admin_view_orders_menu(message: Message, state: FSMContext):
     """Обработчик нажатия на кнопку «Просмотреть заказы»."""
     user_id = message.from_user.id
@@ -493,42 +690,34 @@ async def admin_view_orders_menu(message: Message, state: FSMContext):
         await message.answer("Нет заказов, ожидающих подтверждения.", reply_markup=admin_menu)
         return
 
+    # fromisoformat вместо strptime — формат даты совместим с ISO
     try:
         sorted_orders = sorted(
             filtered_orders,
-            key=lambda x: datetime.datetime.strptime(x['date'], "%Y-%m-%d %H:%M:%S"),
+            key=lambda x: datetime.datetime.fromisoformat(x['date']),
             reverse=True
         )
     except Exception as e:
         logging.error(f"Ошибка при сортировке заказов: {e}")
         sorted_orders = filtered_orders
 
-    page_size = 10
-    total_orders = len(sorted_orders)
-    pages = (total_orders + page_size - 1) // page_size
-
-    for page in range(pages):
-        start = page * page_size
-        end = start + page_size
-        chunk = sorted_orders[start:end]
-
-        text = "<b>Заказы:</b>\n\n"
-        for o in chunk:
-            text += (
-                f"№ {o['OrderID']}\n"
-                f"Пользователь: @{o['user_name']} (ID: {o['user_id']})\n"
-                f"Торт: {o['cake_name']}\n"
-                f"Цена: {o['price']} руб.\n"
-                f"Вкус: {o['taste']}\n"
-                f"Размер: {o['size']} персон\n"
-                f"Декор: {o['decor']}\n"
-                f"Статус: {o['status']}\n"
-                f"Дата: {o['date']}\n"
-                "-----------------------\n"
-            )
-        await message.answer(text, parse_mode='HTML', reply_markup=admin_menu)
-
-@router.message(lambda m: m.text == "Обновить статус заказа")
+    # Блоки копим в список и склеиваем через join; сообщение уходит,
+    # только когда следующий блок не влезает в лимит длины Telegram
+    parts = ["<b>Заказы:</b>\n\n"]
+    length = len(parts[0])
+    for o in sorted_orders:
+        block = _ADMIN_ORDER_TPL.format_map(o)
+        if length + len(block) > 3900:
+            await message.answer("".join(parts), parse_mode='HTML', reply_markup=admin_menu)
+            parts = []
+            length = 0
+        parts.append(block)
+        length += len(block)
+
+    if parts:
+        await message.answer("".join(parts), parse_mode='HTML', reply_markup=admin_menu)
+
+@router.message(F.text == "Обновить статус заказа")
 async def admin_update_status_menu(message: Message, state: FSMContext):
     """Начинаем процесс обновления статуса: просим ввести OrderID и новый статус."""
     user_id = message.from_user.id
@@ -538,12 +727,7 @@ async def admin_update_status_menu(message: Message, state: FSMContext):
 
     await message.answer(
         "Введите OrderID и новый статус через пробел.\nНапример: `1 Доставлен`",
-        reply_markup=ReplyKeyboardMarkup(
-            keyboard=[
-                [KeyboardButton(text="Отмена")]
-            ],
-            resize_keyboard=True
-        )
+        reply_markup=CANCEL_KB
     )
     await state.set_state(AdminStates.UpdatingOrderStatus)
 
@@ -563,12 +747,7 @@ async def admin_process_update_status(message: Message, state: FSMContext):
     if len(parts) != 2:
         await message.answer(
             "Неверный формат. Введите OrderID и новый статус через пробел.\nНапример: `1 Доставлен`",
-            reply_markup=ReplyKeyboardMarkup(
-                keyboard=[
-                    [KeyboardButton(text="Отмена")]
-                ],
-                resize_keyboard=True
-            )
+            reply_markup=CANCEL_KB
         )
         return
 
@@ -576,22 +755,15 @@ async def admin_process_update_status(message: Message, state: FSMContext):
     if not order_id.isdigit():
         await message.answer(
             "OrderID должен быть числом.",
-            reply_markup=ReplyKeyboardMarkup(
-                keyboard=[
-                    [KeyboardButton(text="Отмена")]
-                ],
-                resize_keyboard=True
-            )
+            reply_markup=CANCEL_KB
         )
         return
 
-    success = await update_order_status(order_id, new_status)
+    success, user_id_to_notify = await update_order_status(order_id, new_status)
     if success:
-        # Отправляем уведомление пользователю
-        all_orders = await get_all_orders()
-        order = next((o for o in all_orders if str(o['OrderID']) == str(order_id)), None)
-        if order:
-            user_id_to_notify = int(order['user_id'])
+        # user_id пришёл вместе с результатом обновления — повторное
+        # чтение всех заказов не нужно
+        if user_id_to_notify is not None:
             await send_status_update(user_id_to_notify, order_id, new_status)
             await message.answer(
                 f"Статус заказа №{order_id} обновлён на '{new_status}'. Уведомление пользователю отправлено.",
@@ -610,10 +782,24 @@ async def admin_process_update_status(message: Message, state: FSMContext):
 
     await state.clear()
 
+# Ссылка на задачу фоновой записи: event loop хранит задачи слабо,
+# без ссылки цикл записи может быть собран GC
+_writer_task = None
+
 # ===== Запуск бота =====
 async def main():
-    global gc
+    global gc, _writer_task
     gc = await get_gspread_client()
+    # Прогреваем хэндлы листов на старте, чтобы первый запрос
+    # пользователя не платил за открытие таблицы
+    try:
+        await _get_orders_sheet()
+        await _get_cakes_sheet()
+    except Exception as e:
+        logging.error(f"Не удалось открыть таблицу на старте: {e}")
+        _reset_sheets()
+    # Фоновая задача записи заказов
+    _writer_task = asyncio.create_task(order_writer())
     await dp.start_polling(bot, skip_updates=True)
 
 if __name__ == "__main__":